@@ -2,27 +2,75 @@
 LLM client for OpenAI-compatible API finalization.
 """
 import os
-import json
 import logging
 from typing import List, Dict, Any, Optional
 import httpx
+import orjson
 from app.models import Profile, LLMRequest, LLMResponse
 
 logger = logging.getLogger(__name__)
 
+# Static instruction prefix sent as the system message. Keeping this block
+# byte-identical across requests lets the provider reuse its prompt/KV cache
+# for the prefix; only the user message varies per request.
+SYSTEM_PROMPT = """You are a product curation expert for a liquor wholesale business. Your task is to curate the best products from the given candidates based on the business profile.
+
+Respond with one JSON object containing: curatedProductIds (array of SKU strings, respect the stated maximum), reasoning (array of strings), confidence (number 0.0-1.0), platinumSupplierProducts, bundledPacks and localFavorites (arrays of SKU strings), businessInsights and nextSteps (arrays of strings).
+
+Guidelines:
+1. Select products that best match the venue type and cuisine style
+2. Prioritize products available in the specified location
+3. Include a good mix of categories appropriate for the venue
+4. Consider supplier tiers (platinum > gold > silver > bronze)
+5. Include some bundle products for variety
+6. Ensure the selection is diverse and not dominated by one brand
+7. Keep reasoning concise and business-focused
+8. Provide actionable insights and next steps"""
+
+
+def create_http_client(api_key: Optional[str] = None) -> httpx.AsyncClient:
+    """
+    Build the shared AsyncClient used for LLM API calls.
+
+    Configured with keep-alive pooling and HTTP/2 multiplexing so repeated
+    chat-completion calls reuse warm connections instead of paying a TCP/TLS
+    handshake each time.
+    """
+    api_key = api_key or os.getenv("LLM_API_KEY", "ollama")
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(30.0, connect=10.0),
+        limits=httpx.Limits(
+            max_connections=100,
+            max_keepalive_connections=20,
+            keepalive_expiry=30.0
+        ),
+        http2=True,
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+    )
+
 
 class LLMClient:
     """Client for OpenAI-compatible LLM API."""
-    
-    def __init__(self):
+
+    def __init__(self, http: Optional[httpx.AsyncClient] = None):
         self.base_url = os.getenv("LLM_BASE_URL", "http://ollama:11434/v1")
         self.api_key = os.getenv("LLM_API_KEY", "ollama")
         self.model = os.getenv("LLM_MODEL", "llama3.1")
         self.temperature = float(os.getenv("LLM_TEMPERATURE", "0.3"))
         self.max_tokens = int(os.getenv("LLM_MAX_TOKENS", "1800"))
-        
-        # HTTP client with timeout
-        self.client = httpx.AsyncClient(timeout=30.0)
+
+        # Prefer an injected client (owned by the application lifespan) so a
+        # single connection pool is shared per process; only build our own
+        # when running standalone (scripts, tests)
+        if http is not None:
+            self.client = http
+            self._owns_client = False
+        else:
+            self.client = create_http_client(self.api_key)
+            self._owns_client = True
     
     async def finalize_candidates(
         self, 
@@ -65,7 +113,12 @@ class LLMClient:
             return None
     
     def _generate_prompt(self, request: LLMRequest) -> str:
-        """Generate prompt for LLM."""
+        """Generate the variable (user-message) portion of the prompt.
+
+        The static role/guidelines text lives in SYSTEM_PROMPT so the prefix
+        stays cacheable; this builds only the per-request profile and
+        candidate block.
+        """
         profile = request.profile
         
         # Extract location information (handles both nested and flat structures)
@@ -93,64 +146,41 @@ Business Profile:
 - Budget Band: {profile.budgetBand or 'Not specified'}
 """
         
-        # Format candidates (limit to top 50 for token efficiency)
-        candidates_text = "Product Candidates:\n"
+        # Format candidates (limit to top 50 for token efficiency); the static
+        # fields were pre-rendered at load time as one pipe-delimited row per
+        # product, so only the index and score are appended.
+        # Accumulate into a list and join once — += on a growing str is O(N^2)
+        parts = ["Product Candidates (idx|sku|name|category1>category2|brand|supplier:tier|origin|bundle|score):"]
         for i, candidate in enumerate(request.candidates[:50]):
-            candidates_text += f"""
-{i+1}. {candidate['name']} (SKU: {candidate['sku']})
-   - Category: {candidate['category_level_1']} / {candidate['category_level_2']}
-   - Brand: {candidate['brand']}
-   - Supplier: {candidate['supplier']} (Tier: {candidate['supplier_tier'] or 'Unknown'})
-   - Origin: {candidate['origin'] or 'Unknown'}
-   - Bundle: {'Yes' if candidate['is_bundle'] else 'No'}
-   - Score: {candidate['composite_score']}
-"""
+            parts.append(f"{i+1}|{candidate['prompt_frag']}|{candidate['composite_score']}")
+        candidates_text = "\n".join(parts)
         
-        prompt = f"""
-You are a product curation expert for a liquor wholesale business. Your task is to curate the best products from the given candidates based on the business profile.
-
-{profile_text}
+        prompt = f"""{profile_text}
 
 {candidates_text}
 
-Please return a JSON response with the following structure:
-{{
-    "curatedProductIds": ["sku1", "sku2", ...],  // Array of product SKUs (max {request.maxProducts})
-    "reasoning": ["reason1", "reason2", ...],  // Array of reasoning strings
-    "confidence": 0.85,  // Confidence score (0.0-1.0)
-    "platinumSupplierProducts": ["sku1", "sku2", ...],  // Platinum supplier products
-    "bundledPacks": ["sku1", "sku2", ...],  // Bundle products
-    "localFavorites": ["sku1", "sku2", ...],  // Local/regional favorites
-    "businessInsights": ["insight1", "insight2", ...],  // Business insights
-    "nextSteps": ["step1", "step2", ...]  // Next steps for the business
-}}
-
-Guidelines:
-1. Select products that best match the venue type and cuisine style
-2. Prioritize products available in the specified location
-3. Include a good mix of categories appropriate for the venue
-4. Consider supplier tiers (platinum > gold > silver > bronze)
-5. Include some bundle products for variety
-6. Ensure the selection is diverse and not dominated by one brand
-7. Keep reasoning concise and business-focused
-8. Provide actionable insights and next steps
-
-Return only the JSON response, no additional text.
+Select at most {request.maxProducts} products for curatedProductIds.
 """
-        
+
         return prompt
     
     async def _call_llm_api(self, prompt: str) -> Optional[Dict[str, Any]]:
-        """Call the LLM API."""
+        """
+        Call the LLM API with a streaming chat completion.
+
+        Consumes the SSE stream line by line, accumulating content deltas as
+        they arrive instead of buffering the full JSON body, which keeps peak
+        memory flat for long completions. Returns a response dict shaped like
+        the non-streaming API so parsing is unchanged.
+        """
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
             payload = {
                 "model": self.model,
                 "messages": [
+                    {
+                        "role": "system",
+                        "content": SYSTEM_PROMPT
+                    },
                     {
                         "role": "user",
                         "content": prompt
@@ -158,22 +188,40 @@ Return only the JSON response, no additional text.
                 ],
                 "temperature": self.temperature,
                 "max_tokens": self.max_tokens,
-                "stream": False
+                # Constrain decoding server-side to valid JSON (supported by
+                # Ollama >= 0.5, vLLM, TGI and OpenAI), which lets the prompt
+                # drop the schema-example prose
+                "response_format": {"type": "json_object"},
+                "stream": True
             }
-            
-            response = await self.client.post(
+
+            content_parts: List[str] = []
+            async with self.client.stream(
+                "POST",
                 f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data
-            else:
-                logger.error(f"LLM API error: {response.status_code} - {response.text}")
-                return None
-                
+                content=orjson.dumps(payload)
+            ) as response:
+                if response.status_code != 200:
+                    body = await response.aread()
+                    logger.error(f"LLM API error: {response.status_code} - {body.decode(errors='replace')}")
+                    return None
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = orjson.loads(data)
+                    choices = chunk.get("choices")
+                    if not choices:
+                        continue
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        content_parts.append(delta)
+
+            return {"choices": [{"message": {"content": "".join(content_parts)}}]}
+
         except Exception as e:
             logger.error(f"LLM API call failed: {e}")
             return None
@@ -193,8 +241,8 @@ Return only the JSON response, no additional text.
             
             # Parse JSON
             try:
-                data = json.loads(content)
-            except json.JSONDecodeError as e:
+                data = orjson.loads(content)
+            except orjson.JSONDecodeError as e:
                 logger.error(f"Invalid JSON in LLM response: {e}")
                 return None
             
@@ -246,5 +294,6 @@ Return only the JSON response, no additional text.
             return None
     
     async def close(self):
-        """Close the HTTP client."""
-        await self.client.aclose()
+        """Close the HTTP client (no-op when the client is owned by the app lifespan)."""
+        if self._owns_client:
+            await self.client.aclose()
@@ -1,100 +1,179 @@
 """
 Product catalog loader for the curation service.
 """
-import json
 import os
+import sys
+from collections import Counter
 from typing import List, Dict, Any, Union
+import ijson
 from app.models import Product
+from app.scoring import BUNDLE_RE, build_compact_base, classify_category
 
 
 def load_products(file_path: str) -> List[Product]:
     """
     Load products from JSON file.
-    
+
     Supports both formats:
     1. Direct array: [product1, product2, ...]
     2. Object with products key: {"products": [product1, product2, ...]}
-    
+
+    Records are stream-parsed one at a time with ijson, so peak memory stays
+    bounded by a single record instead of the whole parsed document.
+
     Args:
         file_path: Path to the products JSON file
-        
+
     Returns:
         List of Product objects
-        
+
     Raises:
         FileNotFoundError: If file doesn't exist
         ValueError: If file format is invalid
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Products file not found: {file_path}")
-    
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Invalid JSON in products file: {e}")
-    except Exception as e:
-        raise ValueError(f"Error reading products file: {e}")
-    
-    # Handle different data formats
-    if isinstance(data, list):
-        products_data = data
-    elif isinstance(data, dict) and 'products' in data:
-        products_data = data['products']
-    else:
-        raise ValueError("Products file must contain either an array of products or an object with 'products' key")
-    
-    if not isinstance(products_data, list):
-        raise ValueError("Products data must be a list")
-    
+
     # Convert to Product objects, handling missing fields gracefully
     products = []
-    for i, product_data in enumerate(products_data):
-        try:
-            # Ensure required fields exist
-            if 'id' not in product_data:
-                product_data['id'] = str(i)
-            if 'name' not in product_data:
-                product_data['name'] = f"Product {i}"
-            
-            # Detect bundle products
-            product_data['is_bundle'] = _detect_bundle(product_data)
-            
-            product = Product(**product_data)
-            products.append(product)
-        except Exception as e:
-            print(f"Warning: Skipping invalid product at index {i}: {e}")
-            continue
-    
+    try:
+        with open(file_path, 'rb') as f:
+            prefix = _detect_stream_prefix(f)
+            for i, product_data in enumerate(ijson.items(f, prefix, use_float=True)):
+                try:
+                    # Ensure required fields exist
+                    if 'id' not in product_data:
+                        product_data['id'] = str(i)
+                    else:
+                        product_data['id'] = str(product_data['id'])
+                    if 'name' not in product_data:
+                        product_data['name'] = f"Product {i}"
+
+                    # Detect bundle products
+                    product_data['is_bundle'] = _detect_bundle(product_data)
+
+                    # The catalog is our own export, so skip per-field Pydantic
+                    # validation; unknown keys are dropped by model_construct
+                    product = Product.model_construct(**{
+                        k: v for k, v in product_data.items() if k in Product.model_fields
+                    })
+                    product.prompt_frag = _build_prompt_frag(product)
+                    # Lower and intern the categorical columns once; the
+                    # catalog repeats the same handful of values thousands of
+                    # times, so interning collapses them to shared objects
+                    product.brand_lower = sys.intern((product.brand or "unknown").lower())
+                    product.category_lower = sys.intern((product.category_level_1 or "unknown").lower())
+                    product.region_lower = sys.intern(product.region.lower()) if product.region else None
+                    product.country_lower = sys.intern(product.country.lower()) if product.country else None
+                    product.origin_lower = sys.intern(product.origin.lower()) if product.origin else None
+                    product.category_code = classify_category(product)
+                    product.compact_base = build_compact_base(product)
+                    products.append(product)
+                except Exception as e:
+                    print(f"Warning: Skipping invalid product at index {i}: {e}")
+                    continue
+    except ijson.JSONError as e:
+        raise ValueError(f"Invalid JSON in products file: {e}")
+
+    # Streaming the object format yields nothing when the 'products' key is
+    # missing or not a list; re-check the shape so malformed catalogs still
+    # fail at startup instead of silently loading 0 products
+    if not products and prefix == 'products.item':
+        _verify_products_array(file_path)
+
     return products
 
 
+def _detect_stream_prefix(f) -> str:
+    """
+    Peek the first non-whitespace byte to pick the ijson item prefix.
+
+    Args:
+        f: Products file opened in binary mode (rewound before returning)
+
+    Returns:
+        'item' for the array format, 'products.item' for the object format
+
+    Raises:
+        ValueError: If the file is empty or starts with neither format
+    """
+    while True:
+        ch = f.read(1)
+        if not ch:
+            raise ValueError("Products file is empty")
+        if not ch.isspace():
+            break
+    f.seek(0)
+
+    if ch == b'[':
+        return 'item'
+    if ch == b'{':
+        return 'products.item'
+    raise ValueError("Products file must contain either an array of products or an object with 'products' key")
+
+
+def _verify_products_array(file_path: str) -> None:
+    """
+    Verify that an object-format file holds a top-level 'products' array.
+
+    Only called when streaming the 'products.item' prefix produced no items,
+    which is ambiguous between a legitimately empty array, a missing key and
+    a non-list value; the low-level event scan distinguishes them.
+
+    Args:
+        file_path: Path to the products JSON file
+
+    Raises:
+        ValueError: If the 'products' key is missing or its value is not a list
+    """
+    with open(file_path, 'rb') as f:
+        for prefix, event, _ in ijson.parse(f):
+            if prefix == 'products':
+                if event == 'start_array':
+                    return
+                raise ValueError("Products data must be a list")
+    raise ValueError("Products file must contain either an array of products or an object with 'products' key")
+
+
+def _build_prompt_frag(product: Product) -> str:
+    """
+    Pre-render the static portion of a product's LLM prompt entry.
+
+    Product fields never change after load, so formatting them once here
+    means the per-request prompt builder only appends the score. The terse
+    pipe-delimited row format keeps prompt token count low; a header line in
+    the prompt names the columns.
+
+    Args:
+        product: Fully constructed product
+
+    Returns:
+        Single-line pipe-delimited fragment (no index, no score)
+    """
+    return (
+        f"{product.sku or product.id}|{product.name}"
+        f"|{product.category_level_1 or '?'}>{product.category_level_2 or '?'}"
+        f"|{product.brand or '?'}"
+        f"|{product.supplier or '?'}:{product.supplier_tier or '?'}"
+        f"|{product.origin or '?'}"
+        f"|{'B' if product.is_bundle else '-'}"
+    )
+
+
 def _detect_bundle(product_data: Dict[str, Any]) -> bool:
     """
     Detect if a product is a bundle based on name and description.
-    
+
     Args:
         product_data: Raw product data dictionary
-        
+
     Returns:
         True if product appears to be a bundle
     """
-    bundle_keywords = [
-        "pack", "bundle", "combo", "set", "collection", 
-        "starter", "sampler", "mixed", "variety"
-    ]
-    
-    # Check name
-    name = product_data.get('name', '').lower()
-    if any(keyword in name for keyword in bundle_keywords):
-        return True
-    
-    # Check description
-    description = product_data.get('product_web_description', '').lower()
-    if any(keyword in description for keyword in bundle_keywords):
-        return True
-    
-    return False
+    return bool(
+        BUNDLE_RE.search(product_data.get('name', '') or '')
+        or BUNDLE_RE.search(product_data.get('product_web_description', '') or '')
+    )
 
 
 def get_products_summary(products: List[Product]) -> Dict[str, Any]:
@@ -109,28 +188,26 @@ def get_products_summary(products: List[Product]) -> Dict[str, Any]:
     """
     if not products:
         return {"total": 0, "visible": 0, "bundles": 0}
-    
-    visible_count = sum(1 for p in products if p.visibility == "4")
-    bundle_count = sum(1 for p in products if p.is_bundle)
-    
-    # Category distribution
-    categories = {}
+
+    # Single pass over the catalog; Counter tallies run in C
+    visible_count = 0
+    bundle_count = 0
+    categories: Counter = Counter()
+    suppliers: Counter = Counter()
     for product in products:
+        if product.visibility == "4":
+            visible_count += 1
+        if product.is_bundle:
+            bundle_count += 1
         if product.category_level_1:
-            cat = product.category_level_1
-            categories[cat] = categories.get(cat, 0) + 1
-    
-    # Supplier distribution
-    suppliers = {}
-    for product in products:
+            categories[product.category_level_1] += 1
         if product.supplier:
-            supplier = product.supplier
-            suppliers[supplier] = suppliers.get(supplier, 0) + 1
-    
+            suppliers[product.supplier] += 1
+
     return {
         "total": len(products),
         "visible": visible_count,
         "bundles": bundle_count,
-        "top_categories": dict(sorted(categories.items(), key=lambda x: x[1], reverse=True)[:10]),
-        "top_suppliers": dict(sorted(suppliers.items(), key=lambda x: x[1], reverse=True)[:10])
+        "top_categories": dict(categories.most_common(10)),
+        "top_suppliers": dict(suppliers.most_common(10))
     }
@@ -2,11 +2,18 @@
 FastAPI main application for the curation service.
 """
 import os
+import asyncio
+import hashlib
 import logging
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+import orjson
 import uvicorn
 from dotenv import load_dotenv
 
@@ -19,7 +26,7 @@ from app.models import (
 )
 from app.loader import load_products, get_products_summary
 from app.scoring import ProductScorer
-from app.llm_client import LLMClient
+from app.llm_client import LLMClient, create_http_client
 
 
 # Configure logging
@@ -31,11 +38,98 @@ PRODUCTS_JSON = os.getenv("PRODUCTS_JSON", "/app/data/products.json")
 DEFAULT_MAX_PRODUCTS = int(os.getenv("DEFAULT_MAX_PRODUCTS", "100"))
 TOP_K_PRESELECT = int(os.getenv("TOP_K_PRESELECT", "250"))
 USE_LLM = os.getenv("USE_LLM", "false").lower() == "true"
+MAX_LLM_CONCURRENCY = int(os.getenv("MAX_LLM_CONCURRENCY", "8"))
+CURATE_CACHE_SIZE = int(os.getenv("CURATE_CACHE_SIZE", "1024"))
+CURATE_CACHE_TTL = float(os.getenv("CURATE_CACHE_TTL", "300"))
+
+# Maps a lowercased profile city to the Product availability field for that
+# city, replacing a five-way comparison chain with one dict lookup
+CITY_ATTR = {
+    "sydney": "sold_at_sydney",
+    "melbourne": "sold_at_melbourne",
+    "brisbane": "sold_at_brisbane",
+    "adelaide": "sold_at_adelaide",
+    "cairns": "sold_at_cairns",
+}
 
 # Global variables
 products: List[Product] = []
+products_summary: Dict[str, Any] = {}
 scorer = ProductScorer()
 llm_client: Optional[LLMClient] = None
+llm_semaphore: Optional[asyncio.Semaphore] = None
+
+# In-memory TTL LRU of curation responses keyed by (profile, maxProducts,
+# catalog version); entries expire after CURATE_CACHE_TTL seconds and the
+# version component invalidates everything when the catalog is reloaded.
+# Entries are serialized snapshots (model_dump dicts with this request's
+# scores injected), not live models built on the shared catalog Products,
+# so a hit replays exactly the body the original request produced
+_curate_cache: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_curate_cache_lock = asyncio.Lock()
+catalog_version = 0
+
+
+def _curate_cache_key(profile: Profile, max_products: int) -> bytes:
+    """Build a stable cache key from the canonicalized profile, product cap and catalog version."""
+    profile_bytes = orjson.dumps(profile.model_dump(exclude_none=True), option=orjson.OPT_SORT_KEYS)
+    suffix = f"{max_products}:{catalog_version}".encode()
+    return hashlib.blake2b(profile_bytes + suffix, digest_size=16).digest()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize the service on startup and release resources on shutdown."""
+    global products, products_summary, llm_client, llm_semaphore, catalog_version
+
+    try:
+        # Load products
+        logger.info(f"Loading products from {PRODUCTS_JSON}")
+        products = load_products(PRODUCTS_JSON)
+        catalog_version += 1
+
+        # Summary statistics are computed once here; the catalog is immutable
+        # after startup, so /stats serves this cached copy
+        products_summary = get_products_summary(products)
+        logger.info(f"Loaded {products_summary['total']} products ({products_summary['visible']} visible, {products_summary['bundles']} bundles)")
+
+        # Precompute the scorer's SoA columns for the immutable catalog
+        scorer.prepare(products)
+
+        # Initialize LLM client if enabled, sharing a single HTTP connection
+        # pool owned by the application lifespan
+        if USE_LLM:
+            app.state.http = create_http_client()
+            llm_client = LLMClient(http=app.state.http)
+            logger.info("LLM client initialized")
+
+            # Pre-warm the connection pool so the first /curate request does
+            # not pay the TCP/TLS handshake to the LLM endpoint
+            try:
+                await llm_client.client.get(f"{llm_client.base_url}/models")
+                logger.info("LLM connection pre-warmed")
+            except Exception as e:
+                logger.warning(f"LLM connection pre-warm failed: {e}")
+        else:
+            app.state.http = None
+            logger.info("LLM disabled - using rule-based scoring only")
+
+        # Bound concurrent LLM finalizations to the provider's rate limit
+        llm_semaphore = asyncio.Semaphore(MAX_LLM_CONCURRENCY)
+
+        logger.info(f"Service initialized with TOP_K_PRESELECT={TOP_K_PRESELECT}, USE_LLM={USE_LLM}")
+
+    except Exception as e:
+        logger.error(f"Failed to initialize service: {e}")
+        raise
+
+    yield
+
+    # Shutdown: close the shared HTTP client
+    if app.state.http is not None:
+        await app.state.http.aclose()
+        logger.info("LLM HTTP client closed")
+
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -43,7 +137,9 @@ app = FastAPI(
     description="AI-powered product curation microservice for liquor wholesale",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -56,32 +152,9 @@ app.add_middleware(
 )
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the service on startup."""
-    global products, llm_client
-    
-    try:
-        # Load products
-        logger.info(f"Loading products from {PRODUCTS_JSON}")
-        products = load_products(PRODUCTS_JSON)
-        
-        # Get summary statistics
-        summary = get_products_summary(products)
-        logger.info(f"Loaded {summary['total']} products ({summary['visible']} visible, {summary['bundles']} bundles)")
-        
-        # Initialize LLM client if enabled
-        if USE_LLM:
-            llm_client = LLMClient()
-            logger.info("LLM client initialized")
-        else:
-            logger.info("LLM disabled - using rule-based scoring only")
-        
-        logger.info(f"Service initialized with TOP_K_PRESELECT={TOP_K_PRESELECT}, USE_LLM={USE_LLM}")
-        
-    except Exception as e:
-        logger.error(f"Failed to initialize service: {e}")
-        raise
+def get_llm_client() -> Optional[LLMClient]:
+    """Dependency that returns the process-wide LLM client (None when disabled)."""
+    return llm_client
 
 
 @app.get("/health")
@@ -91,7 +164,7 @@ async def health_check():
         "status": "healthy",
         "products_loaded": len(products),
         "llm_enabled": USE_LLM,
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.now(timezone.utc).isoformat()
     }
 
 
@@ -100,50 +173,99 @@ async def get_stats():
     """Get service statistics."""
     if not products:
         raise HTTPException(status_code=503, detail="Products not loaded")
-    
-    summary = get_products_summary(products)
+
     return {
-        "products": summary,
+        "products": products_summary,
         "config": {
             "top_k_preselect": TOP_K_PRESELECT,
             "default_max_products": DEFAULT_MAX_PRODUCTS,
             "llm_enabled": USE_LLM
         },
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.now(timezone.utc).isoformat()
     }
 
 
-@app.post("/curate", response_model=CurateResponse)
-async def curate_products(request: CurateRequest):
+async def _curate_one(request: CurateRequest, llm: Optional[LLMClient]) -> Dict[str, Any]:
     """
-    Curate products based on business profile.
-    
-    Args:
-        request: Curation request with profile and max products
-        
-    Returns:
-        Curated product response with reasoning
+    Run the full curation pipeline (scoring, selection, optional LLM
+    finalization) for one request.
+
+    Returns the CurateResponse serialized with model_dump(mode="json") —
+    the same snapshot that is cached — so endpoints hand the dict straight
+    to ORJSONResponse.
     """
-    if not products:
-        raise HTTPException(status_code=503, detail="Products not loaded")
-    
     try:
         # Use provided max products or default
         max_products = request.maxProducts or DEFAULT_MAX_PRODUCTS
-        
-        # Run rule-based scoring
+
+        # Serve repeated profiles from the cache, skipping scoring and the
+        # LLM call entirely
+        cache_key = _curate_cache_key(request.profile, max_products)
+        async with _curate_cache_lock:
+            entry = _curate_cache.get(cache_key)
+            if entry is not None:
+                expires_at, cached = entry
+                if time.monotonic() < expires_at:
+                    _curate_cache.move_to_end(cache_key)
+                    logger.info("Serving curation from cache")
+                    return cached
+                del _curate_cache[cache_key]
+
+        # Run rule-based scoring in a worker thread — for large catalogs the
+        # pure-Python scoring pass would otherwise block the event loop and
+        # stall concurrent requests
         logger.info(f"Scoring products for profile: {request.profile.venueType}")
-        scored_products = scorer.score_products(products, request.profile)
-        
+        scored_products, score_breakdown = await asyncio.to_thread(
+            scorer.score_products, products, request.profile, TOP_K_PRESELECT
+        )
+
         # Select candidates
-        candidates = scorer.select_candidates(scored_products, TOP_K_PRESELECT)
+        candidates = await asyncio.to_thread(scorer.select_candidates, scored_products, TOP_K_PRESELECT)
+
+        # On a skewed catalog the argpartition pool can be dominated by a few
+        # brand/category combinations, whose max-3 diversity cap then starves
+        # selection; if the pooled ordering was truncated and still came up
+        # short, re-rank the full catalog so selection can scan deeper
+        if len(candidates) < TOP_K_PRESELECT and len(scored_products) < products_summary["visible"]:
+            logger.info(
+                f"Pooled ranking yielded only {len(candidates)} diverse candidates; re-ranking full catalog"
+            )
+            scored_products, score_breakdown = await asyncio.to_thread(
+                scorer.score_products, products, request.profile
+            )
+            candidates = await asyncio.to_thread(scorer.select_candidates, scored_products, TOP_K_PRESELECT)
         logger.info(f"Selected {len(candidates)} candidates")
-        
-        # Prepare base response with complete products
+
+        # Kick off LLM finalization immediately so the network wait overlaps
+        # with assembling the rule-based response below
+        llm_task = None
+        if USE_LLM and llm:
+            logger.info("Applying LLM finalization")
+            llm_task = asyncio.create_task(llm.finalize_candidates(
+                request.profile,
+                scorer.create_compact_candidates(candidates, score_breakdown),
+                max_products
+            ))
+
+        # Prepare base response with complete products; one fused pass over
+        # the candidates fills all three highlight lists, stopping early once
+        # every cap is hit
         curated_products = candidates[:max_products]
-        platinum_products = [p for p in candidates if p.supplier_tier == "platinum"][:10]
-        bundled_products = [p for p in candidates if p.is_bundle][:10]
-        local_favorite_products = _get_local_favorite_products(candidates, request.profile)[:10]
+        location = _get_location_from_profile(request.profile)
+        local_attr = CITY_ATTR.get((location.get('city') or '').lower())
+
+        platinum_products: List[Product] = []
+        bundled_products: List[Product] = []
+        local_favorite_products: List[Product] = []
+        for p in candidates:
+            if len(platinum_products) < 10 and p.supplier_tier == "platinum":
+                platinum_products.append(p)
+            if len(bundled_products) < 10 and p.is_bundle:
+                bundled_products.append(p)
+            if len(local_favorite_products) < 10 and local_attr and getattr(p, local_attr) == 1:
+                local_favorite_products.append(p)
+            if len(platinum_products) >= 10 and len(bundled_products) >= 10 and len(local_favorite_products) >= 10:
+                break
         
         response_data = {
             "curatedProductIds": [p.sku or p.id for p in curated_products],  # Keep for backward compatibility
@@ -158,25 +280,22 @@ async def curate_products(request: CurateRequest):
             "localFavoriteProducts": local_favorite_products,  # New field with complete products
             "businessInsights": _generate_business_insights(request.profile, candidates),
             "nextSteps": _generate_next_steps(request.profile),
-            "generatedAt": datetime.utcnow()
+            "generatedAt": datetime.now(timezone.utc)
         }
         
-        # Apply LLM finalization if enabled
-        if USE_LLM and llm_client:
+        # Merge in the LLM finalization if it was started
+        if llm_task is not None:
             try:
-                logger.info("Applying LLM finalization")
-                llm_response = await llm_client.finalize_candidates(
-                    request.profile, 
-                    scorer.create_compact_candidates(candidates),
-                    max_products
-                )
-                
+                llm_response = await llm_task
+
                 if llm_response:
-                    # For LLM response, we need to map the SKUs back to full products
-                    llm_curated_products = _map_skus_to_products(llm_response.curatedProductIds, candidates)
-                    llm_platinum_products = _map_skus_to_products(llm_response.platinumSupplierProducts, candidates)
-                    llm_bundled_products = _map_skus_to_products(llm_response.bundledPacks, candidates)
-                    llm_local_products = _map_skus_to_products(llm_response.localFavorites, candidates)
+                    # For LLM response, we need to map the SKUs back to full products;
+                    # build the index once and share it across the four lookups
+                    sku_index = {(p.sku or p.id): p for p in candidates}
+                    llm_curated_products = _map_skus_to_products(llm_response.curatedProductIds, sku_index)
+                    llm_platinum_products = _map_skus_to_products(llm_response.platinumSupplierProducts, sku_index)
+                    llm_bundled_products = _map_skus_to_products(llm_response.bundledPacks, sku_index)
+                    llm_local_products = _map_skus_to_products(llm_response.localFavorites, sku_index)
                     
                     # Merge LLM response with base response
                     response_data.update({
@@ -201,13 +320,82 @@ async def curate_products(request: CurateRequest):
                 logger.error(f"LLM finalization error: {e}")
                 logger.info("Falling back to rule-based results")
         
-        return CurateResponse(**response_data)
-        
+        # Every field here is generated server-side, so construction can skip
+        # Pydantic validation
+        payload = CurateResponse.model_construct(**response_data).model_dump(mode="json")
+
+        # Scoring never writes onto the shared catalog products, so the
+        # dumped product dicts carry the composite_score field default;
+        # inject this request's values from the breakdown before the
+        # snapshot is cached
+        for field in ("curatedProducts", "platinumProducts", "bundledProducts", "localFavoriteProducts"):
+            for product_dict in payload[field]:
+                scores = score_breakdown.get(product_dict["id"])
+                if scores is not None:
+                    product_dict["composite_score"] = scores[3]
+
+        async with _curate_cache_lock:
+            _curate_cache[cache_key] = (time.monotonic() + CURATE_CACHE_TTL, payload)
+            _curate_cache.move_to_end(cache_key)
+            while len(_curate_cache) > CURATE_CACHE_SIZE:
+                _curate_cache.popitem(last=False)
+
+        return payload
+
     except Exception as e:
         logger.error(f"Curation error: {e}")
         raise HTTPException(status_code=500, detail=f"Curation failed: {str(e)}")
 
 
+@app.post("/curate", response_model=None)
+async def curate_products(request: CurateRequest, llm: Optional[LLMClient] = Depends(get_llm_client)) -> ORJSONResponse:
+    """
+    Curate products based on business profile.
+
+    The response body is a CurateResponse serialized directly with orjson;
+    declaring it as response_model would make FastAPI revalidate every
+    nested Product we just produced ourselves.
+
+    Args:
+        request: Curation request with profile and max products
+        llm: Shared LLM client (injected; None when LLM is disabled)
+
+    Returns:
+        Curated product response with reasoning
+    """
+    if not products:
+        raise HTTPException(status_code=503, detail="Products not loaded")
+
+    return ORJSONResponse(content=await _curate_one(request, llm))
+
+
+@app.post("/curate/batch", response_model=None)
+async def curate_batch(requests: List[CurateRequest], llm: Optional[LLMClient] = Depends(get_llm_client)) -> ORJSONResponse:
+    """
+    Curate products for multiple business profiles concurrently.
+
+    Requests fan out with asyncio.gather while a semaphore bounds concurrent
+    LLM finalizations to MAX_LLM_CONCURRENCY, so a large batch cannot exceed
+    the provider's rate limit. Like /curate, the body is a list of
+    CurateResponse dicts serialized directly with orjson instead of being
+    revalidated through a response_model.
+
+    Args:
+        requests: List of curation requests
+
+    Returns:
+        List of curated product responses, in request order
+    """
+    if not products:
+        raise HTTPException(status_code=503, detail="Products not loaded")
+
+    async def _one(request: CurateRequest) -> Dict[str, Any]:
+        async with llm_semaphore:
+            return await _curate_one(request, llm)
+
+    return ORJSONResponse(content=list(await asyncio.gather(*[_one(request) for request in requests])))
+
+
 def _get_location_from_profile(profile: Profile) -> Dict[str, str]:
     """Extract location information from profile (handles both nested and flat structures)."""
     location = {}
@@ -266,46 +454,9 @@ def _generate_rule_based_reasoning(profile: Profile, products: List[Product]) ->
     return reasoning
 
 
-def _get_local_favorites(products: List[Product], profile: Profile) -> List[str]:
-    """Get local favorite products based on location."""
-    local_favorites = []
-    location = _get_location_from_profile(profile)
-    
-    for product in products:
-        if location.get('city'):
-            city_lower = location['city'].lower()
-            if (city_lower == "sydney" and product.sold_at_sydney == 1) or \
-               (city_lower == "melbourne" and product.sold_at_melbourne == 1) or \
-               (city_lower == "brisbane" and product.sold_at_brisbane == 1) or \
-               (city_lower == "adelaide" and product.sold_at_adelaide == 1) or \
-               (city_lower == "cairns" and product.sold_at_cairns == 1):
-                local_favorites.append(product.sku or product.id)
-    
-    return local_favorites
-
-
-def _get_local_favorite_products(products: List[Product], profile: Profile) -> List[Product]:
-    """Get local favorite products as complete Product objects based on location."""
-    local_favorites = []
-    location = _get_location_from_profile(profile)
-    
-    for product in products:
-        if location.get('city'):
-            city_lower = location['city'].lower()
-            if (city_lower == "sydney" and product.sold_at_sydney == 1) or \
-               (city_lower == "melbourne" and product.sold_at_melbourne == 1) or \
-               (city_lower == "brisbane" and product.sold_at_brisbane == 1) or \
-               (city_lower == "adelaide" and product.sold_at_adelaide == 1) or \
-               (city_lower == "cairns" and product.sold_at_cairns == 1):
-                local_favorites.append(product)
-    
-    return local_favorites
-
-
-def _map_skus_to_products(skus: List[str], candidates: List[Product]) -> List[Product]:
-    """Map SKU IDs back to complete Product objects."""
-    sku_to_product = {p.sku or p.id: p for p in candidates}
-    return [sku_to_product[sku] for sku in skus if sku in sku_to_product]
+def _map_skus_to_products(skus: List[str], sku_index: Dict[str, Product]) -> List[Product]:
+    """Map SKU IDs back to complete Product objects using a prebuilt SKU index."""
+    return [sku_index[sku] for sku in skus if sku in sku_index]
 
 
 def _generate_business_insights(profile: Profile, products: List[Product]) -> List[str]:
@@ -358,5 +509,7 @@ if __name__ == "__main__":
         "app.main:app",
         host=os.getenv("UVICORN_HOST", "0.0.0.0"),
         port=int(os.getenv("UVICORN_PORT", "8000")),
+        loop="uvloop",
+        http="httptools",
         reload=False
     )
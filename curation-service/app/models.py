@@ -2,7 +2,7 @@
 Pydantic models for the curation service API.
 """
 from typing import Optional, List, Dict, Any, Union
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 
 
@@ -14,6 +14,9 @@ class Location(BaseModel):
     country: Optional[str] = None
     postcode: Optional[str] = None
 
+    # Build the core schema on first validation instead of at import time
+    model_config = ConfigDict(defer_build=True)
+
 
 class Profile(BaseModel):
     """Business profile for product curation."""
@@ -22,14 +25,16 @@ class Profile(BaseModel):
     venueType: str
     cuisineStyle: Optional[str] = None
     budgetBand: Optional[str] = Field(None, pattern="^(low|mid|premium)$")
-    
-    # Allow additional fields for dynamic questionnaire responses
-    class Config:
-        extra = "allow"
+
+    # Allow additional fields for dynamic questionnaire responses; schema
+    # build is deferred to first use like the other models
+    model_config = ConfigDict(extra="allow", defer_build=True)
 
 
 class Product(BaseModel):
     """Product model for internal processing."""
+    model_config = ConfigDict(defer_build=True)
+
     id: str
     sku: Optional[str] = None
     name: str
@@ -54,9 +59,29 @@ class Product(BaseModel):
     
     # Computed fields
     is_bundle: bool = False
-    locality_score: float = 0.0
-    category_fitness: float = 0.0
-    supplier_boost: float = 0.0
+    # Pre-rendered LLM prompt fragment (static fields only); built once at
+    # load time and excluded from API responses
+    prompt_frag: Optional[str] = Field(default=None, exclude=True)
+    # Lowercased diversity keys cached at load time so selection never
+    # re-allocates lowered strings; excluded from API responses
+    brand_lower: str = Field(default="unknown", exclude=True)
+    category_lower: str = Field(default="unknown", exclude=True)
+    # Lowered (and interned) location columns cached at load time so the
+    # scorer's match columns never re-lower catalog strings; None mirrors a
+    # missing source field
+    region_lower: Optional[str] = Field(default=None, exclude=True)
+    country_lower: Optional[str] = Field(default=None, exclude=True)
+    origin_lower: Optional[str] = Field(default=None, exclude=True)
+    # Static portion of the compact LLM candidate dict, prebuilt at load
+    # time; per-request code only merges in the four rounded scores
+    compact_base: Optional[Dict[str, Any]] = Field(default=None, exclude=True)
+    # Index into scoring.CATEGORY_ORDER computed at load time; -1 means not
+    # yet classified (the scorer classifies lazily for ad-hoc products)
+    category_code: int = Field(default=-1, exclude=True)
+    # Scoring never mutates shared catalog objects: every score (composite
+    # included) is returned by score_products as a per-request breakdown,
+    # and the serialized value is injected into the dumped response payload.
+    # The field stays in the schema so responses keep exposing it
     composite_score: float = 0.0
 
 
@@ -85,6 +110,8 @@ class CurateResponse(BaseModel):
 
 class LLMRequest(BaseModel):
     """Request model for LLM finalization."""
+    model_config = ConfigDict(defer_build=True)
+
     profile: Profile
     candidates: List[Dict[str, Any]]
     maxProducts: int
@@ -92,6 +119,8 @@ class LLMRequest(BaseModel):
 
 class LLMResponse(BaseModel):
     """Response model from LLM."""
+    model_config = ConfigDict(defer_build=True)
+
     curatedProductIds: List[str]
     reasoning: List[str]
     confidence: float
@@ -1,13 +1,149 @@
 """
 Rule-based scoring system for product curation.
 """
-from typing import List, Dict, Any, Set, Tuple
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
 from app.models import Product, Profile
+from app.scoring_kernel import score_kernel
+
+# Fixed category ordering shared by the code columns and weight rows
+CATEGORY_ORDER = ["wine", "champagne", "sparkling", "spirits", "beer", "default"]
+CATEGORY_INDEX = {name: i for i, name in enumerate(CATEGORY_ORDER)}
+
+# Single compiled alternation covering every bundle keyword; word boundaries
+# avoid false positives from substrings (e.g. "sunset"). The loader runs this
+# once per product at ingest and caches the result as Product.is_bundle
+BUNDLE_RE = re.compile(
+    r"\b(?:pack|bundle|combo|set|collection|starter|sampler|mixed|variety|assortment)\b",
+    re.IGNORECASE
+)
+
+# Cities with a sold_at_* availability field on Product
+CITY_FIELDS = {
+    "sydney": "sold_at_sydney",
+    "melbourne": "sold_at_melbourne",
+    "brisbane": "sold_at_brisbane",
+    "adelaide": "sold_at_adelaide",
+    "cairns": "sold_at_cairns",
+}
+
+
+def classify_category(product: Product) -> int:
+    """
+    Classify a product into a CATEGORY_ORDER code from its category levels.
+
+    Runs once per product at catalog ingest; per-request scoring then reads
+    the cached code instead of re-scanning category strings.
+    """
+    for level in [product.category_level_1, product.category_level_2, product.category_level_3]:
+        if level:
+            category = level.lower()
+            # Map to standard categories
+            if "wine" in category:
+                return CATEGORY_INDEX["wine"]
+            elif "champagne" in category:
+                return CATEGORY_INDEX["champagne"]
+            elif "sparkling" in category:
+                return CATEGORY_INDEX["sparkling"]
+            elif "spirit" in category:
+                return CATEGORY_INDEX["spirits"]
+            elif "beer" in category:
+                return CATEGORY_INDEX["beer"]
+            elif "liquor" in category:
+                return CATEGORY_INDEX["spirits"]
+
+    return CATEGORY_INDEX["default"]
+
+
+def _encode_column(values: List[Optional[str]]) -> Tuple[List[Optional[str]], np.ndarray]:
+    """Dictionary-encode a low-cardinality column into (uniques, int32 codes)."""
+    codes = np.empty(len(values), dtype=np.int32)
+    index: Dict[Optional[str], int] = {}
+    uniques: List[Optional[str]] = []
+    for i, value in enumerate(values):
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(uniques)
+            uniques.append(value)
+        codes[i] = code
+    return uniques, codes
+
+
+def build_compact_base(product: Product) -> Dict[str, Any]:
+    """
+    Build the static fields of a product's compact LLM candidate dict.
+
+    Product fields never change after load, so the loader caches this on
+    each product (Product.compact_base); create_compact_candidates then only
+    copies the dict and merges in the per-request scores instead of doing
+    ~18 attribute reads per candidate.
+    """
+    return {
+        "id": product.id,
+        "sku": product.sku or product.id,
+        "name": product.name,
+        "category_level_1": product.category_level_1,
+        "category_level_2": product.category_level_2,
+        "category_level_3": product.category_level_3,
+        "category_level_4": product.category_level_4,
+        "brand": product.brand,
+        "supplier": product.supplier,
+        "supplier_tier": product.supplier_tier,
+        "origin": product.origin,
+        "region": product.region,
+        "country": product.country,
+        "tags": product.tags or [],
+        "is_bundle": product.is_bundle,
+        "prompt_frag": product.prompt_frag,
+    }
+
+
+@dataclass(slots=True)
+class ScoringArrays:
+    """
+    Structure-of-arrays view of the visible catalog used by the vectorized
+    scorer. Built once (the catalog is immutable after startup) so each
+    request only runs dense array arithmetic instead of per-product Python.
+    """
+    products: List[Product]            # visible products, row-aligned with all columns
+    category_codes: np.ndarray         # (N,) int8 index into CATEGORY_ORDER
+    tier_codes: np.ndarray             # (N,) int8 index into the tier weight table
+    tier_sort_weights: np.ndarray      # (N,) float64 tie-break weight (exact legacy sort key)
+    is_bundle: np.ndarray              # (N,) bool
+    sold_at: Dict[str, np.ndarray]     # city -> (N,) float64 availability (0.0/1.0)
+    # Dictionary-encoded location columns: the catalog repeats a small set of
+    # regions/countries/origins, so substring matching runs once per unique
+    # value and a code gather expands the result to all N rows
+    region_uniques: List[Optional[str]]
+    region_codes: np.ndarray           # (N,) int32 index into region_uniques
+    country_uniques: List[Optional[str]]
+    country_codes: np.ndarray
+    origin_uniques: List[Optional[str]]
+    origin_codes: np.ndarray
+    supplier_codes: np.ndarray         # (N,) int lexicographic rank of supplier name
+
+
+@dataclass(slots=True)
+class ScoringContext:
+    """
+    Profile-derived scoring inputs, extracted once per request. The old
+    per-product helpers re-read the profile (location dict, lowercase calls,
+    weight lookups) for every product; everything the kernel needs from the
+    profile lives here instead.
+    """
+    city_lower: str
+    state_lower: str
+    country_lower: str
+    weight_row: np.ndarray      # (len(CATEGORY_ORDER),) venue weights by category code
+    fine_dining_bonus: bool     # champagne/sparkling bonus applies
 
 
 class ProductScorer:
     """Rule-based product scoring and selection."""
-    
+
     def __init__(self):
         # Category fitness weights by venue type
         self.venue_weights = {
@@ -61,46 +197,213 @@ class ProductScorer:
             "bronze": 0.4,
             "default": 0.5
         }
-        
-        # Bundle detection keywords
-        self.bundle_keywords = [
-            "pack", "bundle", "combo", "set", "collection",
-            "starter", "sampler", "mixed", "variety", "assortment"
-        ]
-    
-    def score_products(self, products: List[Product], profile: Profile) -> List[Product]:
+
+        # Venue weight rows flattened into a (venues, categories) matrix so
+        # each request fetches its row with one index instead of nested dict
+        # lookups; float64 keeps scores bit-identical to the dict path
+        self._venue_index = {name: i for i, name in enumerate(self.venue_weights)}
+        self._venue_weight_matrix = np.array(
+            [[weights.get(c, weights["default"]) for c in CATEGORY_ORDER]
+             for weights in self.venue_weights.values()],
+            dtype=np.float64
+        )
+
+        # Tier weight table indexed by tier code (order matters; "default"
+        # is last and doubles as the unknown-tier slot)
+        self._tier_order = ["platinum", "gold", "silver", "bronze", "default"]
+        self._tier_weight_table = np.array(
+            [self.supplier_weights[t] for t in self._tier_order], dtype=np.float64
+        )
+
+        # SoA columns prepared from the catalog (see prepare())
+        self._arrays: Optional[ScoringArrays] = None
+        self._arrays_source: Optional[List[Product]] = None
+
+    def prepare(self, products: List[Product]) -> None:
+        """
+        Precompute the SoA scoring columns for an immutable catalog.
+
+        Call once at startup; score_products falls back to building the
+        columns on the fly when handed a different product list.
+        """
+        self._arrays = self._build_arrays(products)
+        self._arrays_source = products
+
+    def _build_arrays(self, products: List[Product]) -> ScoringArrays:
+        """Build row-aligned scoring columns for the visible subset of the catalog."""
+        visible = [p for p in products if p.visibility == "4"]
+        n = len(visible)
+
+        category_codes = np.fromiter(
+            (p.category_code if p.category_code >= 0 else classify_category(p) for p in visible),
+            dtype=np.int8, count=n
+        )
+        tier_index = {t: i for i, t in enumerate(self._tier_order)}
+        default_code = tier_index["default"]
+        tier_codes = np.fromiter(
+            ((tier_index.get((p.supplier_tier or "default").lower(), default_code)) for p in visible),
+            dtype=np.int8, count=n
+        )
+        # Exact legacy tie-break key: the raw (non-lowered) tier looked up
+        # with a 0 fallback, as the old sorted() lambda did
+        tier_sort_weights = np.fromiter(
+            (self.supplier_weights.get(p.supplier_tier or "default", 0) for p in visible),
+            dtype=np.float64, count=n
+        )
+        is_bundle = np.fromiter((p.is_bundle for p in visible), dtype=bool, count=n)
+
+        # Stored in the kernel's dtype so the per-request pick is a plain
+        # dict lookup with no conversion copy
+        sold_at = {
+            city: np.fromiter((getattr(p, attr) == 1 for p in visible), dtype=np.float64, count=n)
+            for city, attr in CITY_FIELDS.items()
+        }
+
+        # Load-time lowered columns when available, lowering on the fly only
+        # for ad-hoc product lists that skipped the loader; dictionary-encoded
+        # so per-request matching only touches the unique values
+        region_uniques, region_codes = _encode_column(
+            [p.region_lower or (p.region.lower() if p.region else None) for p in visible]
+        )
+        country_uniques, country_codes = _encode_column(
+            [p.country_lower or (p.country.lower() if p.country else None) for p in visible]
+        )
+        origin_uniques, origin_codes = _encode_column(
+            [p.origin_lower or (p.origin.lower() if p.origin else None) for p in visible]
+        )
+
+        # Rank supplier names so the tertiary sort key is numeric
+        suppliers = np.array([p.supplier or "" for p in visible], dtype=object)
+        _, supplier_codes = np.unique(suppliers, return_inverse=True) if n else (None, np.empty(0, dtype=np.int64))
+
+        return ScoringArrays(
+            products=visible,
+            category_codes=category_codes,
+            tier_codes=tier_codes,
+            tier_sort_weights=tier_sort_weights,
+            is_bundle=is_bundle,
+            sold_at=sold_at,
+            region_uniques=region_uniques,
+            region_codes=region_codes,
+            country_uniques=country_uniques,
+            country_codes=country_codes,
+            origin_uniques=origin_uniques,
+            origin_codes=origin_codes,
+            supplier_codes=supplier_codes,
+        )
+
+    def _get_arrays(self, products: List[Product]) -> ScoringArrays:
+        """Return the prepared columns, rebuilding only for an unfamiliar product list."""
+        if self._arrays is not None and self._arrays_source is products:
+            return self._arrays
+        return self._build_arrays(products)
+
+    def score_products(self, products: List[Product], profile: Profile,
+                       top_k: Optional[int] = None
+                       ) -> Tuple[List[Product], Dict[str, Tuple[float, float, float]]]:
         """
         Score and rank products based on business profile.
-        
+
+        The scoring math runs as vectorized NumPy arithmetic over SoA columns
+        rather than per-product Python dispatch.
+
         Args:
             products: List of products to score
             profile: Business profile for scoring
-            
+            top_k: When set, only the leading ~4*top_k products are fully
+                ordered (usually enough headroom for select_candidates'
+                diversity skipping); the rest of the catalog is dropped after
+                an O(N) partition instead of being sorted. On catalogs skewed
+                toward a few brand/category combinations the truncated
+                ordering may not hold top_k diversity-distinct rows — callers
+                should re-score without top_k if selection comes up short
+
         Returns:
-            List of products sorted by composite score (highest first)
+            Tuple of (products sorted by composite score highest first,
+            per-request breakdown mapping product id to its
+            (locality, category_fitness, supplier_boost, composite) scores)
         """
-        # Filter visible products first
-        visible_products = [p for p in products if p.visibility == "4"]
-        
-        # Score each product
-        for product in visible_products:
-            product.locality_score = self._calculate_locality_score(product, profile)
-            product.category_fitness = self._calculate_category_fitness(product, profile)
-            product.supplier_boost = self._calculate_supplier_boost(product)
-            product.composite_score = self._calculate_composite_score(product)
-        
-        # Sort by composite score, then by supplier tier, then by supplier name
-        scored_products = sorted(
-            visible_products, 
-            key=lambda p: (
-                p.composite_score,  # Primary: composite score (descending)
-                self.supplier_weights.get(p.supplier_tier or "default", 0),  # Secondary: supplier tier (descending)
-                p.supplier or ""  # Tertiary: supplier name (ascending for consistency)
-            ), 
-            reverse=True
+        arrays = self._get_arrays(products)
+        visible = arrays.products
+        n = len(visible)
+        if n == 0:
+            return [], {}
+
+        ctx = self._build_context(profile)
+
+        # Per-request match masks; the heavy arithmetic runs in score_kernel
+        zeros = np.zeros(n, dtype=np.float64)
+        city_mask = arrays.sold_at.get(ctx.city_lower, zeros)
+
+        # Substring matches run over the unique values only, then a code
+        # gather expands each result to the full catalog
+        if ctx.state_lower:
+            region_match = np.fromiter(
+                (ctx.state_lower in u if u else False for u in arrays.region_uniques),
+                dtype=np.float64, count=len(arrays.region_uniques)
+            )[arrays.region_codes]
+        else:
+            region_match = zeros
+
+        if ctx.country_lower:
+            country_match = np.fromiter(
+                (ctx.country_lower in u if u else False for u in arrays.country_uniques),
+                dtype=np.float64, count=len(arrays.country_uniques)
+            )[arrays.country_codes]
+            origin_match = np.fromiter(
+                (ctx.country_lower in u if u else False for u in arrays.origin_uniques),
+                dtype=np.float64, count=len(arrays.origin_uniques)
+            )[arrays.origin_codes]
+        else:
+            country_match = zeros
+            origin_match = zeros
+
+        if ctx.fine_dining_bonus:
+            bonus_mask = (arrays.category_codes == CATEGORY_INDEX["champagne"]) | \
+                         (arrays.category_codes == CATEGORY_INDEX["sparkling"])
+        else:
+            bonus_mask = np.zeros(n, dtype=bool)
+
+        locality = np.empty(n, dtype=np.float64)
+        category_fitness = np.empty(n, dtype=np.float64)
+        supplier_boost = np.empty(n, dtype=np.float64)
+        composite = np.empty(n, dtype=np.float64)
+        score_kernel(
+            city_mask, region_match, country_match, origin_match,
+            arrays.category_codes, ctx.weight_row, bonus_mask,
+            arrays.tier_codes, self._tier_weight_table, arrays.is_bundle,
+            locality, category_fitness, supplier_boost, composite
         )
-        
-        return scored_products
+
+        # No score is ever written onto the shared catalog objects — the
+        # composite travels in the per-request breakdown alongside the
+        # sub-scores, so concurrent requests (scoring runs off-loop in
+        # worker threads) cannot overwrite each other's results
+        breakdown: Dict[str, Tuple[float, float, float, float]] = {}
+        for i, product in enumerate(visible):
+            breakdown[product.id] = (
+                float(locality[i]), float(category_fitness[i]),
+                float(supplier_boost[i]), float(composite[i])
+            )
+
+        # Sort by composite score, then by supplier tier, then by supplier
+        # name; negating every key under a stable lexsort reproduces the
+        # previous sorted(..., reverse=True) ordering exactly
+        if top_k is not None and top_k * 4 < n:
+            # O(N) partition to a pool of 4*top_k, then sort only the pool.
+            # Everything tied with the pool boundary is kept so the tier and
+            # supplier tie-breaks match a full sort exactly
+            pool = top_k * 4
+            part = np.argpartition(-composite, pool - 1)[:pool]
+            keep = np.nonzero(composite >= composite[part].min())[0]
+            order = keep[np.lexsort((
+                -arrays.supplier_codes[keep],
+                -arrays.tier_sort_weights[keep],
+                -composite[keep],
+            ))][:pool]
+        else:
+            order = np.lexsort((-arrays.supplier_codes, -arrays.tier_sort_weights, -composite))
+        return [visible[i] for i in order], breakdown
     
     def select_candidates(self, scored_products: List[Product], top_k: int = 250) -> List[Product]:
         """
@@ -114,25 +417,36 @@ class ProductScorer:
             List of diverse candidate products
         """
         candidates = []
-        seen_combinations: Set[Tuple[str, str]] = set()
-        
+        counts: Counter = Counter()
+
         for product in scored_products:
             if len(candidates) >= top_k:
                 break
-                
-            # Create diversity key (brand, category_level_1)
-            brand = product.brand or "unknown"
-            category = product.category_level_1 or "unknown"
-            diversity_key = (brand.lower(), category.lower())
-            
+
+            # Diversity key (brand, category_level_1), lowered once at load time
+            diversity_key = (product.brand_lower, product.category_lower)
+
             # Apply diversity constraint (max 3 per brand-category combination)
-            count = sum(1 for b, c in seen_combinations if b == brand.lower() and c == category.lower())
-            if count < 3:
+            if counts[diversity_key] < 3:
                 candidates.append(product)
-                seen_combinations.add(diversity_key)
-        
+                counts[diversity_key] += 1
+
         return candidates
     
+    def _build_context(self, profile: Profile) -> ScoringContext:
+        """Extract every profile-derived scoring input exactly once per request."""
+        location = self._get_location_from_profile(profile)
+        venue_type = profile.venueType.lower()
+        cuisine_style = (profile.cuisineStyle or "").lower()
+        venue_idx = self._venue_index.get(venue_type, self._venue_index["restaurant"])
+        return ScoringContext(
+            city_lower=(location.get('city') or '').lower(),
+            state_lower=(location.get('state') or '').lower(),
+            country_lower=(location.get('country') or '').lower(),
+            weight_row=self._venue_weight_matrix[venue_idx],
+            fine_dining_bonus=(venue_type == "fine dining" and cuisine_style == "fine dining"),
+        )
+
     def _get_location_from_profile(self, profile: Profile) -> Dict[str, str]:
         """Extract location information from profile (handles both nested and flat structures)."""
         location = {}
@@ -158,144 +472,34 @@ class ProductScorer:
         
         return location
 
-    def _calculate_locality_score(self, product: Product, profile: Profile) -> float:
-        """Calculate locality score based on location preferences."""
-        score = 0.0
-        location = self._get_location_from_profile(profile)
-        
-        # City availability boost
-        if location.get('city'):
-            city_lower = location['city'].lower()
-            if city_lower == "sydney" and product.sold_at_sydney == 1:
-                score += 0.3
-            elif city_lower == "melbourne" and product.sold_at_melbourne == 1:
-                score += 0.3
-            elif city_lower == "brisbane" and product.sold_at_brisbane == 1:
-                score += 0.3
-            elif city_lower == "adelaide" and product.sold_at_adelaide == 1:
-                score += 0.3
-            elif city_lower == "cairns" and product.sold_at_cairns == 1:
-                score += 0.3
-        
-        # Regional/country match boost
-        if location.get('state') and product.region:
-            if location['state'].lower() in product.region.lower():
-                score += 0.2
-        
-        if location.get('country') and product.country:
-            if location['country'].lower() in product.country.lower():
-                score += 0.2
-        
-        # Origin match boost
-        if product.origin and location.get('country'):
-            if location['country'].lower() in product.origin.lower():
-                score += 0.1
-        
-        return min(score, 1.0)  # Cap at 1.0
-    
-    def _calculate_category_fitness(self, product: Product, profile: Profile) -> float:
-        """Calculate category fitness based on venue type and cuisine style."""
-        venue_type = profile.venueType.lower()
-        cuisine_style = (profile.cuisineStyle or "").lower()
-        
-        # Get base weights for venue type
-        weights = self.venue_weights.get(venue_type, self.venue_weights["restaurant"])
-        
-        # Determine product category
-        category = self._extract_category(product)
-        base_weight = weights.get(category, weights["default"])
-        
-        # Fine dining champagne boost
-        if venue_type == "fine dining" and cuisine_style == "fine dining":
-            if category in ["champagne", "sparkling"]:
-                base_weight += 0.2
-        
-        # Bundle boost
-        if product.is_bundle:
-            base_weight += 0.1
-        
-        return min(base_weight, 1.0)  # Cap at 1.0
-    
-    def _calculate_supplier_boost(self, product: Product) -> float:
-        """Calculate supplier tier boost."""
-        if not product.supplier_tier:
-            return self.supplier_weights["default"]
-        
-        tier = product.supplier_tier.lower()
-        return self.supplier_weights.get(tier, self.supplier_weights["default"])
-    
-    def _calculate_composite_score(self, product: Product) -> float:
-        """Calculate final composite score."""
-        # Weighted combination of all factors
-        locality_weight = 0.3
-        category_weight = 0.4
-        supplier_weight = 0.2
-        bundle_weight = 0.1
-        
-        score = (
-            locality_weight * product.locality_score +
-            category_weight * product.category_fitness +
-            supplier_weight * product.supplier_boost +
-            bundle_weight * (0.1 if product.is_bundle else 0.0)
-        )
-        
-        return min(score, 1.0)  # Cap at 1.0
-    
-    def _extract_category(self, product: Product) -> str:
-        """Extract primary category from product."""
-        # Try category levels in order
-        for level in [product.category_level_1, product.category_level_2, product.category_level_3]:
-            if level:
-                category = level.lower()
-                # Map to standard categories
-                if "wine" in category:
-                    return "wine"
-                elif "champagne" in category:
-                    return "champagne"
-                elif "sparkling" in category:
-                    return "sparkling"
-                elif "spirit" in category:
-                    return "spirits"
-                elif "beer" in category:
-                    return "beer"
-                elif "liquor" in category:
-                    return "spirits"
-        
-        return "default"
-    
-    def create_compact_candidates(self, candidates: List[Product]) -> List[Dict[str, Any]]:
+    def create_compact_candidates(self, candidates: List[Product],
+                                  breakdown: Dict[str, Tuple[float, float, float, float]]
+                                  ) -> List[Dict[str, Any]]:
         """
         Create compact representation of candidates for LLM processing.
-        
+
         Args:
             candidates: List of candidate products
-            
+            breakdown: Per-request score breakdown from score_products
+
         Returns:
             List of compact product dictionaries
         """
         compact = []
         for product in candidates:
-            compact_product = {
-                "id": product.id,
-                "sku": product.sku or product.id,
-                "name": product.name,
-                "category_level_1": product.category_level_1,
-                "category_level_2": product.category_level_2,
-                "category_level_3": product.category_level_3,
-                "category_level_4": product.category_level_4,
-                "brand": product.brand,
-                "supplier": product.supplier,
-                "supplier_tier": product.supplier_tier,
-                "origin": product.origin,
-                "region": product.region,
-                "country": product.country,
-                "tags": product.tags or [],
-                "is_bundle": product.is_bundle,
-                "composite_score": round(product.composite_score, 3),
-                "locality_score": round(product.locality_score, 3),
-                "category_fitness": round(product.category_fitness, 3),
-                "supplier_boost": round(product.supplier_boost, 3)
-            }
-            compact.append(compact_product)
-        
+            base = product.compact_base
+            if base is None:
+                # Cache lazily for products that skipped the loader
+                base = product.compact_base = build_compact_base(product)
+            locality, category_fitness, supplier_boost, composite = breakdown.get(
+                product.id, (0.0, 0.0, 0.0, 0.0)
+            )
+            compact.append({
+                **base,
+                "composite_score": round(composite, 3),
+                "locality_score": round(locality, 3),
+                "category_fitness": round(category_fitness, 3),
+                "supplier_boost": round(supplier_boost, 3)
+            })
+
         return compact
@@ -2,95 +2,327 @@
 """
 Verification script for the consolidated Paramount Launchpad setup.
 """
-import requests
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
 import time
 import subprocess
 import sys
 
+# orjson decodes the API responses 2-3x faster than stdlib json; it is a
+# single C extension that imports in about a millisecond, but stays optional
+# so the script keeps working from a bare interpreter
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
+
+def _loads(data):
+    """Decode JSON bytes with orjson when installed, stdlib json otherwise."""
+    if _orjson is not None:
+        return _orjson.loads(data)
+    return json.loads(data)
+
+# The HTTP stack (httpx pulls in httpcore, h11, certifi, ...) costs tens of
+# milliseconds of interpreter startup, so it is imported on first use rather
+# than at module load; paths that never reach the network (--help, argparse
+# errors, and main()'s missing-Docker-CLI bail-out) skip it entirely
+httpx = None
+CLIENT_LIMITS = None
+PROBE_TIMEOUT = None
+GET_TIMEOUT = None
+CURATE_TIMEOUT = None
+
+
+def _init_http():
+    """Import httpx and build the shared client configuration on first use."""
+    global httpx, CLIENT_LIMITS, PROBE_TIMEOUT, GET_TIMEOUT, CURATE_TIMEOUT
+    if httpx is not None:
+        return
+    import httpx as _httpx
+    httpx = _httpx
+
+    # One pooled client for every HTTP call in the script: keep-alive lets
+    # the probes and the /health -> /stats -> /curate sequence share
+    # connections, and asyncio overlaps the waits without spawning threads.
+    # HTTP/2 is pointless against the plain-HTTP/1.1 local services
+    CLIENT_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+    # Loopback connects either succeed or get ECONNREFUSED within
+    # microseconds, so a tight connect budget makes a down service fail in
+    # well under a second while the read budgets stay generous
+    PROBE_TIMEOUT = httpx.Timeout(2, connect=0.25)
+    GET_TIMEOUT = httpx.Timeout(5, connect=0.5)
+    CURATE_TIMEOUT = httpx.Timeout(10, connect=0.5)
+
+# Right after `docker compose up -d` the services race the script: connects
+# get refused and proxied endpoints briefly answer 502/503/504. The transport
+# retries failed connects; _send_with_retry re-issues requests that land on a
+# retryable status with exponential backoff
+CLIENT_RETRIES = 3
+RETRY_STATUSES = {502, 503, 504}
+RETRY_BACKOFF = 0.25
+
+
+async def _send_with_retry(send, attempts=CLIENT_RETRIES, backoff=RETRY_BACKOFF):
+    """Run a zero-arg request coroutine factory, retrying retryable statuses."""
+    response = await send()
+    for attempt in range(attempts):
+        if response.status_code not in RETRY_STATUSES:
+            break
+        await asyncio.sleep(backoff * (2 ** attempt))
+        response = await send()
+    return response
+
+# Short-TTL disk cache for idempotent GETs so back-to-back verification runs
+# during setup debugging short-circuit repeat fetches; --no-cache bypasses it
+# and POST /curate is never cached because it exercises the server
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "paramount-verify")
+CACHE_TTL = 30.0
+USE_CACHE = True
+
+
+def _parse_args(argv=None):
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="Verify the Paramount Launchpad setup")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="bypass the short-lived disk cache for GET checks")
+    parser.add_argument("--watch", type=float, metavar="SECONDS",
+                        help="keep polling at this interval, reporting state changes")
+    parser.add_argument("--max-iters", type=int, default=0, metavar="N",
+                        help="stop --watch after N iterations (0 = run until interrupted)")
+    return parser.parse_args(argv)
+
+# The curation test payload never changes, so encode it once at import; the
+# per-call POST then ships prebuilt bytes instead of re-serializing a dict
+TEST_PROFILE = {
+    "tier": "bronze",
+    "location": {
+        "city": "Sydney",
+        "state": "NSW",
+        "country": "Australia"
+    },
+    "venueType": "restaurant",
+    "cuisineStyle": "fine dining"
+}
+CURATE_BODY = json.dumps({"profile": TEST_PROFILE, "maxProducts": 5}).encode()
+
+
+class _CachedResponse:
+    """Minimal stand-in for an httpx.Response replayed from the disk cache."""
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    def json(self):
+        return _loads(self.content)
+
+
+async def cached_get(client, url, timeout=None):
+    """GET through the disk cache, hitting the network only on miss or expiry."""
+    if timeout is None:
+        timeout = GET_TIMEOUT
+    path = os.path.join(
+        CACHE_DIR, hashlib.blake2b(url.encode(), digest_size=16).hexdigest() + ".json"
+    )
+    if USE_CACHE:
+        try:
+            if time.time() - os.path.getmtime(path) < CACHE_TTL:
+                with open(path) as f:
+                    entry = json.load(f)
+                return _CachedResponse(entry["status_code"], entry["body"].encode())
+        except (OSError, ValueError, KeyError):
+            pass
+
+    response = await _send_with_retry(lambda: client.get(url, timeout=timeout))
+    if USE_CACHE and response.status_code == 200:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"status_code": response.status_code, "body": response.text}, f)
+            os.replace(tmp, path)  # atomic, so concurrent runs never see partial writes
+        except (OSError, ValueError):
+            pass
+    return response
+
+
+def _docker_compose_state(_cache={}):
+    """Determine the Docker Compose CLI state once ('ok'/'broken'/'missing')."""
+    if 'state' in _cache:
+        return _cache['state']
+
+    # which() is a few stat calls — no point paying fork+exec when the CLI
+    # is not installed at all
+    if shutil.which('docker') is None:
+        _cache['state'] = 'missing'
+        return 'missing'
+
+    try:
+        # 'compose version' only checks the plugin, without querying the
+        # daemon socket like 'compose ps' does
+        result = subprocess.run(
+            ['docker', 'compose', 'version'],
+            capture_output=True, text=True,
+            stdin=subprocess.DEVNULL, timeout=3
+        )
+        _cache['state'] = 'ok' if result.returncode == 0 else 'broken'
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        _cache['state'] = 'broken'
+    return _cache['state']
+
 
 def check_docker_compose():
     """Check if Docker Compose is available."""
-    try:
-        result = subprocess.run(['docker', 'compose', 'ps'], capture_output=True, text=True)
-        if result.returncode == 0:
-            print("✅ Docker Compose is available")
-            return True
-        else:
-            print("❌ Docker Compose not working properly")
-            return False
-    except FileNotFoundError:
+    state = _docker_compose_state()
+    if state == 'ok':
+        print("✅ Docker Compose is available")
+        return True
+    if state == 'missing':
         print("❌ Docker Compose not found")
+    else:
+        print("❌ Docker Compose not working properly")
+    return False
+
+
+async def _tcp_up(port, timeout=0.5):
+    """Return True if something is listening on the local port."""
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection("127.0.0.1", port), timeout
+        )
+    except (OSError, asyncio.TimeoutError):
         return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
 
 
-def check_services():
-    """Check if services are running."""
+async def _http_up(client, url, timeout=None):
+    """Return True if the URL answers an HTTP HEAD request."""
+    try:
+        await client.head(url, timeout=timeout if timeout is not None else PROBE_TIMEOUT)
+        return True
+    except httpx.HTTPError:
+        return False
+
+
+async def _probe_services(client):
+    """Probe every service port concurrently; returns [(service, config, up)]."""
+    # Postgres and Ollama are checked with a raw TCP connect — Postgres does
+    # not speak HTTP at all, so a GET would burn its whole timeout waiting
+    # for a response that never comes. Only the curation service gets a real
+    # HTTP probe (HEAD, so the server does no body work)
     services = {
-        'postgres': {'port': 5432, 'name': 'PostgreSQL'},
-        'curation': {'port': 8000, 'name': 'Curation Service'},
-        'ollama': {'port': 11434, 'name': 'Ollama LLM'}
+        'postgres': {'port': 5432, 'name': 'PostgreSQL', 'http': False},
+        'curation': {'port': 8000, 'name': 'Curation Service', 'http': True},
+        'ollama': {'port': 11434, 'name': 'Ollama LLM', 'http': False}
     }
-    
+
+    # Probe all ports concurrently so unresponsive services overlap their
+    # timeouts instead of serializing them; results come back in dict order
+    # so the printed status lines stay stable. The connects ride one epoll
+    # loop — batching them through io_uring instead was considered and
+    # rejected: it would add a liburing dependency for a handful of probes,
+    # and Docker's default seccomp profile blocks io_uring syscalls, which is
+    # exactly where this script usually runs
+    results = await asyncio.gather(*(
+        _http_up(client, f"http://localhost:{config['port']}/health")
+        if config['http'] else _tcp_up(config['port'])
+        for config in services.values()
+    ))
+    return [(service, config, up) for (service, config), up in zip(services.items(), results)]
+
+
+def _report_services(probe_results):
+    """Print per-service status lines and collect the running service names."""
     running_services = []
-    
-    for service, config in services.items():
-        try:
-            response = requests.get(f"http://localhost:{config['port']}", timeout=2)
+    for service, config, up in probe_results:
+        if up:
             running_services.append(service)
             print(f"✅ {config['name']} is running on port {config['port']}")
-        except requests.exceptions.RequestException:
+        else:
             print(f"⚠️  {config['name']} not responding on port {config['port']}")
-    
     return running_services
 
 
-def test_curation_api():
+async def check_services(client):
+    """Check if services are running."""
+    return _report_services(await _probe_services(client))
+
+
+async def test_curation_api(client):
     """Test the curation API."""
     try:
+        # The three calls are independent, so fire them together and overlap
+        # their round-trips; validation below still runs in the original
+        # health -> stats -> curate order with early bail-out
+        health_task = asyncio.create_task(cached_get(client, "http://localhost:8000/health"))
+        stats_task = asyncio.create_task(cached_get(client, "http://localhost:8000/stats"))
+        curation_task = asyncio.create_task(_send_with_retry(lambda: client.post(
+            "http://localhost:8000/curate",
+            content=CURATE_BODY,
+            headers={"Content-Type": "application/json"},
+            timeout=CURATE_TIMEOUT
+        )))
+        tasks = [health_task, stats_task, curation_task]
+
+        # If any call dies at the transport level (service down mid-test),
+        # cancel whatever is still in flight rather than waiting out the
+        # slow /curate budget, then surface the first error in check order
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        if pending:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        first_error = None
+        for task in tasks:
+            if task.cancelled():
+                continue
+            # Retrieve every exception so none is logged as unretrieved,
+            # but report the earliest one in check order
+            error = task.exception()
+            if error is not None and first_error is None:
+                first_error = error
+        if first_error is not None:
+            raise first_error
+
+        health_response = health_task.result()
+        stats_response = stats_task.result()
+        curation_response = curation_task.result()
+
         # Test health endpoint
-        health_response = requests.get("http://localhost:8000/health", timeout=5)
         if health_response.status_code == 200:
             print("✅ Curation service health check passed")
-            health_data = health_response.json()
+            health_data = _loads(health_response.content)
             print(f"   Products loaded: {health_data.get('products_loaded', 'Unknown')}")
             print(f"   LLM enabled: {health_data.get('llm_enabled', 'Unknown')}")
         else:
             print(f"❌ Curation service health check failed: {health_response.status_code}")
             return False
-        
+
         # Test stats endpoint
-        stats_response = requests.get("http://localhost:8000/stats", timeout=5)
         if stats_response.status_code == 200:
             print("✅ Curation service stats endpoint working")
-            stats_data = stats_response.json()
+            stats_data = _loads(stats_response.content)
             print(f"   Total products: {stats_data['products']['total']}")
             print(f"   Visible products: {stats_data['products']['visible']}")
         else:
             print(f"❌ Curation service stats failed: {stats_response.status_code}")
             return False
-        
+
         # Test curation endpoint
-        test_profile = {
-            "tier": "bronze",
-            "location": {
-                "city": "Sydney",
-                "state": "NSW",
-                "country": "Australia"
-            },
-            "venueType": "restaurant",
-            "cuisineStyle": "fine dining"
-        }
-        
-        curation_response = requests.post(
-            "http://localhost:8000/curate",
-            json={"profile": test_profile, "maxProducts": 5},
-            headers={"Content-Type": "application/json"},
-            timeout=10
-        )
-        
         if curation_response.status_code == 200:
             print("✅ Curation API test passed")
-            result = curation_response.json()
+            result = _loads(curation_response.content)
             print(f"   Curated products: {len(result['curatedProductIds'])}")
             print(f"   Confidence: {result['confidence']}")
             return True
@@ -104,39 +336,98 @@ def test_curation_api():
         return False
 
 
-def main():
+async def _watch(client, interval, max_iters=0):
+    """Poll the services, re-reporting only when their state changes."""
+    prev_state = None
+    iteration = 0
+    while True:
+        iteration += 1
+        probe_results = await _probe_services(client)
+        state = tuple(up for _, _, up in probe_results)
+        if state != prev_state:
+            print(f"--- {time.strftime('%H:%M:%S')} (iteration {iteration}) ---")
+            running_services = _report_services(probe_results)
+            if 'curation' in running_services:
+                await test_curation_api(client)
+            print()
+            prev_state = state
+        if max_iters and iteration >= max_iters:
+            break
+        await asyncio.sleep(interval)
+
+
+async def main():
     """Run verification checks."""
+    args = _parse_args()
+    global USE_CACHE
+    if args.no_cache:
+        USE_CACHE = False
+
     print("🔍 Paramount Launchpad - Setup Verification")
     print("=" * 50)
     print()
-    
-    # Check Docker Compose
-    if not check_docker_compose():
+
+    # A missing Docker CLI is detected with a few stat calls, so bail out
+    # here, before the deferred httpx import — that path never touches the
+    # network and should not pay for the HTTP stack. A present-but-broken
+    # CLI still goes through the overlapped subprocess check below
+    if shutil.which('docker') is None:
+        check_docker_compose()
         print("\n❌ Please install Docker and Docker Compose first")
         sys.exit(1)
-    
-    print()
-    
-    # Check running services
-    print("🔍 Checking running services...")
-    running_services = check_services()
-    print()
-    
-    if not running_services:
-        print("❌ No services are running. Please start them first:")
-        print("   docker compose up -d")
-        sys.exit(1)
-    
-    # Test curation service if it's running
-    if 'curation' in running_services:
-        print("🧪 Testing Curation Service...")
-        if test_curation_api():
-            print("✅ Curation service is working correctly!")
-        else:
-            print("❌ Curation service has issues")
+
+    _init_http()
+    async with httpx.AsyncClient(
+        limits=CLIENT_LIMITS,
+        transport=httpx.AsyncHTTPTransport(retries=CLIENT_RETRIES)
+    ) as client:
+        # Watch mode keeps one process (and its keep-alive connections)
+        # alive across iterations instead of paying interpreter startup and
+        # fresh handshakes per run of the script in a shell loop
+        if args.watch is not None:
+            if not check_docker_compose():
+                print("\n❌ Please install Docker and Docker Compose first")
+                sys.exit(1)
+            print()
+            print(f"🔍 Watching services every {args.watch:g}s (Ctrl+C to stop)...")
+            await _watch(client, args.watch, args.max_iters)
+            return
+        # The Docker CLI check (a subprocess) and the port probes are
+        # independent I/O, so overlap them and report in the usual order
+        # once both finish
+        docker_ok, probe_results = await asyncio.gather(
+            asyncio.to_thread(_docker_compose_state),
+            _probe_services(client)
+        )
+
+        # Check Docker Compose
+        check_docker_compose()
+        if docker_ok != 'ok':
+            print("\n❌ Please install Docker and Docker Compose first")
             sys.exit(1)
-    else:
-        print("⚠️  Curation service not running - skipping API tests")
+
+        print()
+
+        # Check running services
+        print("🔍 Checking running services...")
+        running_services = _report_services(probe_results)
+        print()
+
+        if not running_services:
+            print("❌ No services are running. Please start them first:")
+            print("   docker compose up -d")
+            sys.exit(1)
+
+        # Test curation service if it's running
+        if 'curation' in running_services:
+            print("🧪 Testing Curation Service...")
+            if await test_curation_api(client):
+                print("✅ Curation service is working correctly!")
+            else:
+                print("❌ Curation service has issues")
+                sys.exit(1)
+        else:
+            print("⚠️  Curation service not running - skipping API tests")
     
     print()
     print("🎉 Setup verification complete!")
@@ -149,4 +440,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass